@@ -1,8 +1,16 @@
 import streamlit as st
-from google import genai
 from pydantic import BaseModel
-from typing import List, Optional, Dict
+from typing import List, Optional, Dict, Tuple, Type
+import hashlib
 import json
+import math
+import os
+import re
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+from functools import lru_cache
 
 # Define Pydantic models for structured outputs
 class UIComponent(BaseModel):
@@ -30,6 +38,221 @@ class StitchPromptExample(BaseModel):
     example_prompt: str
     description: str
 
+# Build result models from Gemini's schema-checked JSON
+def parse_structured(text: str, model: Type[BaseModel]) -> List[BaseModel]:
+    return [model.model_construct(**item) for item in json.loads(text)]
+
+# Join items into one markdown block with hard line breaks
+def bullet_list(items: List[str], marker: str = "•") -> str:
+    return "  \n".join(f"{marker} {item}" for item in items)
+
+# Limits shared by the app's caches
+CACHE_MAX_ENTRIES = 128
+CACHE_TTL = 3600  # seconds
+
+# Build the generation context from (label, value) pairs, skipping empty values
+@lru_cache(maxsize=CACHE_MAX_ENTRIES)
+def build_context(items: Tuple[Tuple[str, str], ...]) -> str:
+    return "\n".join(f"{label}: {value}" for label, value in items if value)
+
+GEMINI_MODEL = "gemini-2.0-flash-exp"
+STREAM_UPDATE_INTERVAL = 0.05  # seconds between streamed preview updates
+
+# Response schemas, looked up by name
+RESPONSE_SCHEMAS = {
+    "UIDesignIdea": list[UIDesignIdea],
+    "UIPromptSuggestion": list[UIPromptSuggestion],
+}
+
+# Create one Gemini client per API key
+@st.cache_resource(ttl=CACHE_TTL, max_entries=CACHE_MAX_ENTRIES)
+def get_client(api_key: str):
+    # Import the Gemini SDK only once an API key is entered
+    from google import genai
+    return genai.Client(api_key=api_key)
+
+# Stream a Gemini response into a placeholder that is cleared when the stream ends or fails
+def stream_text(client, contents: str, schema_name: Optional[str] = None) -> str:
+    config = None
+    if schema_name:
+        config = {
+            "response_mime_type": "application/json",
+            "response_schema": RESPONSE_SCHEMAS[schema_name],
+        }
+    placeholder = st.empty()
+    text = ""
+    last_update = 0.0
+    try:
+        for chunk in client.models.generate_content_stream(
+            model=GEMINI_MODEL,
+            contents=contents,
+            config=config,
+        ):
+            text += chunk.text or ""
+            now = time.monotonic()
+            if now - last_update > STREAM_UPDATE_INTERVAL:
+                placeholder.code(text, language="json" if schema_name else "text")
+                last_update = now
+    finally:
+        placeholder.empty()
+    return text
+
+class ResponseNotCached(Exception):
+    pass
+
+# Final response texts per API key hash; a lookup without _text raises, so misses aren't cached
+@st.cache_data(ttl=CACHE_TTL, max_entries=CACHE_MAX_ENTRIES, show_spinner=False)
+def cached_response(api_key_hash: str, contents: str, schema_name: Optional[str], _text: Optional[str] = None) -> str:
+    if _text is None:
+        raise ResponseNotCached
+    return _text
+
+# With fresh=True the cached response is dropped and replaced by a new one
+def generate_text(api_key: str, contents: str, schema_name: Optional[str] = None, fresh: bool = False) -> str:
+    api_key_hash = hash_api_key(api_key)
+    if fresh:
+        cached_response.clear(api_key_hash, contents, schema_name)
+    try:
+        return cached_response(api_key_hash, contents, schema_name)
+    except ResponseNotCached:
+        text = stream_text(get_client(api_key), contents, schema_name)
+        return cached_response(api_key_hash, contents, schema_name, text)
+
+# Hash an API key for use in cache keys and file names
+def hash_api_key(api_key: str) -> str:
+    return hashlib.sha256(api_key.encode("utf-8")).hexdigest()
+
+# Top-level sections of the app, in display order
+SECTIONS = ["📚 Stitch Guide", "💡 Sample Ideas", "✨ Generate Prompt", "🎯 Refine Screen", "📝 Saved Prompts"]
+
+# Fields of a saved prompt, each a session-state column keyed by prompt uid
+PROMPT_FIELDS = ("title", "prompt", "project_type", "level", "timestamp", "filename")
+
+# Fields of each record in the "Download All" export
+EXPORT_FIELDS = ("title", "prompt", "project_type", "level", "timestamp")
+
+# Saved prompts are written here, one JSON file per API key hash
+SAVED_PROMPTS_DIR = Path(__file__).parent / ".saved_prompts"
+
+# Saved prompt cards rendered per page of the Saved Prompts section
+PROMPTS_PER_PAGE = 10
+
+# Actions offered by each saved prompt card's form
+CARD_ACTIONS = ("🎯 Use for Refinement", "🗑️ Delete")
+
+# Characters not allowed in download filenames
+_FILENAME_RE = re.compile(r'[^\w\-]+')
+
+# Sample app templates
+TEMPLATES = {
+    "Dashboard App": {
+        "description": "Analytics dashboard with charts and metrics",
+        "features": ["Real-time data visualization", "Customizable widgets", "Export functionality"],
+        "components": ["Charts", "Cards", "Tables", "Filters"]
+    },
+    "E-commerce Platform": {
+        "description": "Online shopping interface with product catalog",
+        "features": ["Product search", "Shopping cart", "User reviews", "Payment integration"],
+        "components": ["Product cards", "Search bar", "Cart drawer", "Checkout form"]
+    },
+    "Social Media Feed": {
+        "description": "Social platform with posts and interactions",
+        "features": ["Post creation", "Like/comment system", "User profiles", "Real-time updates"],
+        "components": ["Post cards", "Comment sections", "User avatars", "Navigation bar"]
+    },
+    "Task Management": {
+        "description": "Project and task tracking application",
+        "features": ["Task creation", "Kanban boards", "Due dates", "Team collaboration"],
+        "components": ["Task cards", "Drag-drop lists", "Calendar view", "Progress bars"]
+    }
+}
+
+REFINEMENT_TEMPLATES = {
+    "Add search": "On the {screen}, add a search bar to the header.",
+    "Enlarge CTA": "Change the primary call-to-action button on the {screen} to be larger and use the brand's primary color.",
+    "Round buttons": "Make all buttons have fully rounded corners.",
+    "Update theme": "Update theme to a {mood} color palette.",
+    "Change font": "Use a {style} font for all text.",
+    "Add spacing": "Increase spacing between all components for better readability.",
+    "Mobile optimize": "Optimize the {screen} layout for mobile devices."
+}
+
+# Selectbox options for the templates
+TEMPLATE_NAMES = tuple(TEMPLATES)
+REFINEMENT_NAMES = ("None",) + tuple(REFINEMENT_TEMPLATES)
+
+# Stitch guide content keyed by expander title: (label, examples) pairs
+GUIDE_SECTIONS = {
+    "High-Level vs. Detailed Prompts": [
+        ("**High-Level (for brainstorming):**", ['"An app for marathon runners."']),
+        ("**Detailed (for specific results):**", ['"An app for marathon runners to engage with a community, find partners, get training advice, and find races near them."']),
+    ],
+    "Set the Vibe with Adjectives": [
+        ("Use adjectives to define the app's feel:", [
+            '"A vibrant and encouraging fitness tracking app."',
+            '"A minimalist and focused app for meditation."',
+        ]),
+    ],
+    "Be Specific with Changes": [
+        ("Focus on one screen/component with clear instructions:", [
+            '"On the homepage, add a search bar to the header."',
+            '"Change the primary call-to-action button on the login screen to be larger and use the brand\'s primary blue color."',
+        ]),
+    ],
+    "Focus on Specific Screens": [
+        ("**E-commerce Example:**", ['"Product detail page for a Japandi-styled tea store. Sells herbal teas, ceramics. Neutral, minimal colors, black buttons. Soft, elegant font."']),
+    ],
+    "Colors": [
+        ("**Specific Color:**", ['"Change primary color to forest green."']),
+        ("**Mood-Based:**", ['"Update theme to a warm, inviting color palette."']),
+    ],
+    "Fonts & Borders": [
+        ("**Font Styles:**", ['"Use a playful sans-serif font."']),
+        ("**Button/Border Styles:**", ['"Make all buttons have fully rounded corners."']),
+    ],
+    "Image Guidelines": [
+        ("**General Images:**", ['"Change background of all product images on landing page to light taupe."']),
+        ("**Specific Image:**", ['"On \'Team\' page, image of \'Dr. Carter\': update her lab coat to black."']),
+    ],
+}
+
+# Markdown for each guide expander, with the examples as fenced code blocks
+GUIDE_MARKDOWN = {
+    section: "\n\n".join(
+        part
+        for label, examples in items
+        for part in (label, *(f"```text\n{example}\n```" for example in examples))
+    )
+    for section, items in GUIDE_SECTIONS.items()
+}
+
+# Static page copy for the no-API-key landing view and the footer
+_GETTING_STARTED_MD = """
+### How to get started:
+
+1. **Get a Google Gemini API Key**: Visit [Google AI Studio](https://makersuite.google.com/app/apikey) to create your API key
+2. **Enter your API key** in the sidebar
+3. **Learn Stitch best practices** in the Stitch Guide tab
+4. **Generate optimized prompts** following Stitch guidelines
+5. **Refine screen by screen** for perfect results
+
+### Features Based on Stitch Official Guide:
+- 📚 Complete Stitch prompt guide with examples
+- 🎯 High-level vs. Detailed prompt generation
+- 🎨 Vibe-setting with adjectives
+- 🔧 Screen-by-screen refinement tools
+- 💾 Save and manage your Stitch prompts
+
+### Stitch Best Practices:
+- Be Clear & Concise
+- One Major Change at a Time
+- Use UI/UX Keywords
+- Reference Elements Specifically
+- Iterate & Experiment
+"""
+
+_FOOTER_MD = "Built with Streamlit and Google Gemini API | Based on [Stitch Prompt Guide](https://stitch.ai) | [Documentation](https://docs.streamlit.io)"
+
 # Initialize Streamlit page config
 st.set_page_config(
     page_title="Stitch UI Prompt Builder",
@@ -37,358 +260,427 @@ st.set_page_config(
     layout="wide"
 )
 
-# Initialize session state
-if 'generated_prompts' not in st.session_state:
-    st.session_state.generated_prompts = []
+# Initialize session state (saved prompts are loaded once the API key is known)
 if 'prompt_level' not in st.session_state:
     st.session_state.prompt_level = 'high-level'
 
-# App header
-st.title("🎨 Stitch UI Prompt Generator")
-st.markdown("Generate effective prompts for building user interfaces with Stitch AI")
+def saved_prompts_path(user_id: str) -> Path:
+    return SAVED_PROMPTS_DIR / f"{user_id}.json"
 
-# Sidebar for API configuration
-with st.sidebar:
-    st.header("Configuration")
-    api_key = st.text_input("Google Gemini API Key", type="password")
-    
-    if api_key:
-        st.success("API Key configured ✓")
-        client = genai.Client(api_key=api_key)
+# Every field must be a column of strings covering the same uids
+def is_saved_prompts_layout(prompts) -> bool:
+    if not isinstance(prompts, dict) or set(prompts) != set(PROMPT_FIELDS):
+        return False
+    uids = prompts["prompt"].keys() if isinstance(prompts["prompt"], dict) else None
+    return all(
+        isinstance(column, dict) and column.keys() == uids
+        and all(isinstance(value, str) for value in column.values())
+        for column in prompts.values()
+    )
+
+# A missing, unreadable or unrecognised file is treated as an empty history
+def read_saved_prompts(user_id: str) -> Dict[str, Dict[str, str]]:
+    try:
+        prompts = json.loads(saved_prompts_path(user_id).read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        prompts = None
+    if not is_saved_prompts_layout(prompts):
+        return {field: {} for field in PROMPT_FIELDS}
+    return prompts
+
+# Saved prompts as a JSON list with one record per prompt, for download
+def export_saved_prompts(prompts: Dict[str, Dict[str, str]]) -> bytes:
+    records = [{field: prompts[field][uid] for field in EXPORT_FIELDS} for uid in prompts["prompt"]]
+    return json.dumps(records, ensure_ascii=False, indent=2).encode("utf-8")
+
+# Set the session's saved prompts and their bulk export
+def set_saved_prompts(prompts: Dict[str, Dict[str, str]]):
+    st.session_state.prompts = prompts
+    st.session_state.prompts_export = export_saved_prompts(prompts)
+
+# Write saved prompts atomically via a temp file
+def write_saved_prompts(prompts: Dict[str, Dict[str, str]]):
+    SAVED_PROMPTS_DIR.mkdir(exist_ok=True)
+    path = saved_prompts_path(st.session_state.prompts_user)
+    tmp_path = path.with_suffix(".tmp")
+    tmp_path.write_text(json.dumps(prompts, ensure_ascii=False), encoding="utf-8")
+    os.replace(tmp_path, path)
+    set_saved_prompts(prompts)
+
+# Lock around saved prompt file updates, shared by all sessions
+@st.cache_resource(show_spinner=False)
+def saved_prompts_lock() -> threading.Lock:
+    return threading.Lock()
+
+# Save a prompt; returns False if it was already saved
+def save_prompt(prompt: Dict[str, str]) -> bool:
+    prompt = {
+        **prompt,
+        "timestamp": datetime.now().strftime("%Y-%m-%d %H:%M"),
+        "filename": f"stitch_prompt_{_FILENAME_RE.sub('_', prompt['title'])}.txt",
+    }
+    # Content-derived id, also used for widget keys
+    uid = hashlib.blake2b(prompt["prompt"].encode("utf-8"), digest_size=8).hexdigest()
+    # Re-read the file so changes from other sessions on the same key are kept
+    with saved_prompts_lock():
+        prompts = read_saved_prompts(st.session_state.prompts_user)
+        if uid in prompts["prompt"]:
+            set_saved_prompts(prompts)
+            return False
+        for field in PROMPT_FIELDS:
+            prompts[field][uid] = prompt[field]
+        write_saved_prompts(prompts)
+    return True
+
+# Delete a saved prompt by uid
+def delete_prompt(uid: str):
+    with saved_prompts_lock():
+        prompts = read_saved_prompts(st.session_state.prompts_user)
+        for column in prompts.values():
+            column.pop(uid, None)
+        write_saved_prompts(prompts)
+
+# Toasts raised in callbacks are queued and shown on the next fragment run
+def queue_toast(message: str, icon: str):
+    st.session_state.setdefault('_pending_toasts', []).append((message, icon))
+
+def flush_toasts():
+    for message, icon in st.session_state.pop('_pending_toasts', []):
+        st.toast(message, icon=icon)
+
+# Submit callback of a saved prompt card's form
+def apply_card_action(uid: str):
+    if st.session_state[f"action_{uid}"] == CARD_ACTIONS[0]:
+        st.session_state.base_prompt = st.session_state.prompts["prompt"][uid]
+        queue_toast("Prompt loaded for refinement!", "🎯")
     else:
-        st.warning("Please enter your Google Gemini API Key")
-    
-    st.markdown("---")
-    st.markdown("### About")
-    st.markdown("This app helps you create effective prompts for Stitch AI following official guidelines.")
-    st.markdown("Based on the [Stitch Prompt Guide](https://stitch.ai)")
+        delete_prompt(uid)
 
-# Main content area
-if api_key:
-    # Tabs for different sections
-    tab1, tab2, tab3, tab4, tab5 = st.tabs(["📚 Stitch Guide", "💡 Sample Ideas", "✨ Generate Prompt", "🎯 Refine Screen", "📝 Saved Prompts"])
+# Click callback for using the refinement as the next base prompt
+def use_refinement():
+    st.session_state.base_prompt = st.session_state.refinement["prompt"]
+    queue_toast("Refinement loaded as base!", "🎯")
+
+# Render each section as a fragment
+@st.fragment
+def render_guide():
+    st.header("📚 Stitch Prompt Guide")
+    
+    guide_col1, guide_col2 = st.columns([1, 1])
     
-    with tab1:
-        st.header("📚 Stitch Prompt Guide")
+    with guide_col1:
+        st.subheader("1. Starting Your Project")
         
-        guide_col1, guide_col2 = st.columns([1, 1])
+        with st.expander("High-Level vs. Detailed Prompts", expanded=True):
+            st.markdown(GUIDE_MARKDOWN["High-Level vs. Detailed Prompts"])
         
-        with guide_col1:
-            st.subheader("1. Starting Your Project")
-            
-            with st.expander("High-Level vs. Detailed Prompts", expanded=True):
-                st.markdown("**High-Level (for brainstorming):**")
-                st.code('"An app for marathon runners."', language="text")
-                
-                st.markdown("**Detailed (for specific results):**")
-                st.code('"An app for marathon runners to engage with a community, find partners, get training advice, and find races near them."', language="text")
-            
-            with st.expander("Set the Vibe with Adjectives"):
-                st.markdown("Use adjectives to define the app's feel:")
-                st.code('"A vibrant and encouraging fitness tracking app."', language="text")
-                st.code('"A minimalist and focused app for meditation."', language="text")
-            
-            st.subheader("2. Refining Your App")
-            
-            with st.expander("Be Specific with Changes"):
-                st.markdown("Focus on one screen/component with clear instructions:")
-                st.code('"On the homepage, add a search bar to the header."', language="text")
-                st.code('"Change the primary call-to-action button on the login screen to be larger and use the brand\'s primary blue color."', language="text")
-            
-            with st.expander("Focus on Specific Screens"):
-                st.markdown("**E-commerce Example:**")
-                st.code('"Product detail page for a Japandi-styled tea store. Sells herbal teas, ceramics. Neutral, minimal colors, black buttons. Soft, elegant font."', language="text")
+        with st.expander("Set the Vibe with Adjectives"):
+            st.markdown(GUIDE_MARKDOWN["Set the Vibe with Adjectives"])
         
-        with guide_col2:
-            st.subheader("3. Controlling App Theme")
-            
-            with st.expander("Colors"):
-                st.markdown("**Specific Color:**")
-                st.code('"Change primary color to forest green."', language="text")
-                
-                st.markdown("**Mood-Based:**")
-                st.code('"Update theme to a warm, inviting color palette."', language="text")
-            
-            with st.expander("Fonts & Borders"):
-                st.markdown("**Font Styles:**")
-                st.code('"Use a playful sans-serif font."', language="text")
-                
-                st.markdown("**Button/Border Styles:**")
-                st.code('"Make all buttons have fully rounded corners."', language="text")
-            
-            st.subheader("4. Modifying Images")
-            
-            with st.expander("Image Guidelines"):
-                st.markdown("**General Images:**")
-                st.code('"Change background of all product images on landing page to light taupe."', language="text")
-                
-                st.markdown("**Specific Image:**")
-                st.code('"On \'Team\' page, image of \'Dr. Carter\': update her lab coat to black."', language="text")
-            
-            st.subheader("💡 Pro Tips")
-            
-            with st.expander("Best Practices", expanded=True):
-                tips = [
-                    "Be Clear & Concise: Avoid ambiguity",
-                    "One Major Change at a Time: Easier to see impact",
-                    "Use UI/UX Keywords: navigation bar, CTA button, card layout",
-                    "Reference Elements Specifically: 'primary button on sign-up form'",
-                    "Iterate & Experiment: Refine with further prompts"
-                ]
-                for tip in tips:
-                    st.markdown(f"• {tip}")
+        st.subheader("2. Refining Your App")
+        
+        with st.expander("Be Specific with Changes"):
+            st.markdown(GUIDE_MARKDOWN["Be Specific with Changes"])
+        
+        with st.expander("Focus on Specific Screens"):
+            st.markdown(GUIDE_MARKDOWN["Focus on Specific Screens"])
     
-    with tab2:
-        st.header("Sample UI Building Ideas")
+    with guide_col2:
+        st.subheader("3. Controlling App Theme")
         
-        col1, col2 = st.columns(2)
+        with st.expander("Colors"):
+            st.markdown(GUIDE_MARKDOWN["Colors"])
         
-        with col1:
-            st.subheader("Pre-built Templates")
-            
-            templates = {
-                "Dashboard App": {
-                    "description": "Analytics dashboard with charts and metrics",
-                    "features": ["Real-time data visualization", "Customizable widgets", "Export functionality"],
-                    "components": ["Charts", "Cards", "Tables", "Filters"]
-                },
-                "E-commerce Platform": {
-                    "description": "Online shopping interface with product catalog",
-                    "features": ["Product search", "Shopping cart", "User reviews", "Payment integration"],
-                    "components": ["Product cards", "Search bar", "Cart drawer", "Checkout form"]
-                },
-                "Social Media Feed": {
-                    "description": "Social platform with posts and interactions",
-                    "features": ["Post creation", "Like/comment system", "User profiles", "Real-time updates"],
-                    "components": ["Post cards", "Comment sections", "User avatars", "Navigation bar"]
-                },
-                "Task Management": {
-                    "description": "Project and task tracking application",
-                    "features": ["Task creation", "Kanban boards", "Due dates", "Team collaboration"],
-                    "components": ["Task cards", "Drag-drop lists", "Calendar view", "Progress bars"]
-                }
-            }
-            
-            selected_template = st.selectbox("Choose a template:", list(templates.keys()))
-            
-            if selected_template:
-                template = templates[selected_template]
-                st.info(f"**Description:** {template['description']}")
-                st.write("**Key Features:**")
-                for feature in template['features']:
-                    st.write(f"• {feature}")
-                st.write("**UI Components:**")
-                for component in template['components']:
-                    st.write(f"• {component}")
+        with st.expander("Fonts & Borders"):
+            st.markdown(GUIDE_MARKDOWN["Fonts & Borders"])
         
-        with col2:
-            st.subheader("Generate Custom Ideas")
-            
-            if st.button("🎲 Generate Random UI Ideas"):
-                with st.spinner("Generating ideas..."):
-                    try:
-                        response = client.models.generate_content(
-                            model="gemini-2.0-flash-exp",
-                            contents="Generate 3 creative and unique UI application ideas with descriptions, features, and required components. Focus on modern, user-friendly designs. Include adjectives that set the vibe for each app.",
-                            config={
-                                "response_mime_type": "application/json",
-                                "response_schema": list[UIDesignIdea],
-                            },
-                        )
-                        
-                        ideas = response.parsed
-                        
-                        for idx, idea in enumerate(ideas):
-                            with st.expander(f"{idea.app_name}", expanded=idx==0):
-                                st.write(f"**Description:** {idea.description}")
-                                st.write(f"**Target Audience:** {idea.target_audience}")
-                                st.write("**Main Features:**")
-                                for feature in idea.main_features:
-                                    st.write(f"• {feature}")
-                                st.write("**UI Components:**")
-                                for component in idea.ui_components:
-                                    st.write(f"• {component}")
-                    
-                    except Exception as e:
-                        st.error(f"Error generating ideas: {str(e)}")
+        st.subheader("4. Modifying Images")
+        
+        with st.expander("Image Guidelines"):
+            st.markdown(GUIDE_MARKDOWN["Image Guidelines"])
+        
+        st.subheader("💡 Pro Tips")
+        
+        with st.expander("Best Practices", expanded=True):
+            tips = [
+                "Be Clear & Concise: Avoid ambiguity",
+                "One Major Change at a Time: Easier to see impact",
+                "Use UI/UX Keywords: navigation bar, CTA button, card layout",
+                "Reference Elements Specifically: 'primary button on sign-up form'",
+                "Iterate & Experiment: Refine with further prompts"
+            ]
+            st.markdown(bullet_list(tips))
+
+@st.fragment
+def render_sample_ideas(api_key):
+    st.header("Sample UI Building Ideas")
     
-    with tab3:
-        st.header("Generate UI Building Prompt")
-        
-        # Prompt level selector
-        prompt_level = st.radio(
-            "Choose prompt level:",
-            ["high-level", "detailed"],
-            format_func=lambda x: "High-Level (Brainstorming)" if x == "high-level" else "Detailed (Specific Results)",
-            horizontal=True
-        )
-        st.session_state.prompt_level = prompt_level
+    col1, col2 = st.columns(2)
+    
+    with col1:
+        st.subheader("Pre-built Templates")
         
-        # Input section
+        selected_template = st.selectbox("Choose a template:", TEMPLATE_NAMES)
+        
+        if selected_template:
+            template = TEMPLATES[selected_template]
+            st.info(f"**Description:** {template['description']}")
+            st.write("**Key Features:**")
+            st.markdown(bullet_list(template['features']))
+            st.write("**UI Components:**")
+            st.markdown(bullet_list(template['components']))
+    
+    with col2:
+        st.subheader("Generate Custom Ideas")
+        
+        if st.button("🎲 Generate Random UI Ideas"):
+            with st.spinner("Generating ideas..."):
+                try:
+                    # Uncached: every click should come up with new ideas
+                    response_text = stream_text(
+                        get_client(api_key),
+                        "Generate 3 creative and unique UI application ideas with descriptions, features, and required components. Focus on modern, user-friendly designs. Include adjectives that set the vibe for each app.",
+                        "UIDesignIdea",
+                    )
+                    
+                    ideas = parse_structured(response_text, UIDesignIdea)
+                    
+                    for idx, idea in enumerate(ideas):
+                        with st.expander(f"{idea.app_name}", expanded=idx==0):
+                            st.write(f"**Description:** {idea.description}")
+                            st.write(f"**Target Audience:** {idea.target_audience}")
+                            st.write("**Main Features:**")
+                            st.markdown(bullet_list(idea.main_features))
+                            st.write("**UI Components:**")
+                            st.markdown(bullet_list(idea.ui_components))
+                
+                except Exception as e:
+                    st.error(f"Error generating ideas: {str(e)}")
+
+@st.fragment
+def render_generate_prompt(api_key):
+    st.header("Generate UI Building Prompt")
+    
+    # Prompt level selector
+    prompt_level = st.radio(
+        "Choose prompt level:",
+        ["high-level", "detailed"],
+        format_func=lambda x: "High-Level (Brainstorming)" if x == "high-level" else "Detailed (Specific Results)",
+        horizontal=True
+    )
+    st.session_state.prompt_level = prompt_level
+    
+    # Selectors that change which fields are shown stay outside the form
+    style_col1, style_col2, style_col3 = st.columns(3)
+    with style_col1:
+        design_style = st.selectbox("Visual style reference:",
+                                  ["Japandi (minimal, neutral)", "Corporate and Professional", 
+                                   "Vibrant and Playful", "Dark and Elegant", "Custom"])
+    with style_col2:
+        color_choice = st.radio("Color specification:", ["Mood-based", "Specific colors"], horizontal=True)
+    with style_col3:
+        font_style = st.selectbox("Font style:",
+                                ["Default", "Playful sans-serif", "Professional serif", 
+                                 "Modern sans-serif", "Elegant serif", "Custom"])
+    
+    # Prompt inputs keyed by the label they get in the generation context
+    params: Dict[str, str] = {}
+    
+    # Project inputs, submitted together
+    with st.form("generate_form"):
         col1, col2 = st.columns([2, 1])
         
         with col1:
             st.subheader("Describe Your UI Project")
             
             if prompt_level == "high-level":
-                project_type = st.text_input("What type of app are you building?", 
-                                           placeholder="e.g., An app for marathon runners")
+                params["Prompt Level"] = "High-Level (for brainstorming)"
+                params["App Type"] = st.text_input("What type of app are you building?", 
+                                                   placeholder="e.g., An app for marathon runners")
                 
-                vibe_adjectives = st.text_input("Describe the vibe with adjectives:",
-                                              placeholder="e.g., vibrant, encouraging, minimalist, focused")
+                params["Vibe/Adjectives"] = st.text_input("Describe the vibe with adjectives:",
+                                                          placeholder="e.g., vibrant, encouraging, minimalist, focused")
             else:
-                project_type = st.text_input("What type of UI are you building?", 
-                                           placeholder="e.g., Dashboard, Mobile app, Landing page")
+                params["Prompt Level"] = "Detailed (for specific results)"
+                params["Project Type"] = st.text_input("What type of UI are you building?", 
+                                                       placeholder="e.g., Dashboard, Mobile app, Landing page")
                 
-                project_description = st.text_area("Describe your project in detail:",
-                                                 placeholder="Include the purpose, target users, and key functionality...",
-                                                 height=150)
+                params["Description"] = st.text_area("Describe your project in detail:",
+                                                     placeholder="Include the purpose, target users, and key functionality...",
+                                                     height=150)
                 
-                key_features = st.text_area("List key features (one per line):",
-                                           placeholder="User authentication\nData visualization\nReal-time updates",
-                                           height=100)
+                params["Features"] = st.text_area("List key features (one per line):",
+                                                  placeholder="User authentication\nData visualization\nReal-time updates",
+                                                  height=100)
                 
-                vibe_adjectives = st.text_input("Describe the vibe with adjectives:",
-                                              placeholder="e.g., vibrant, professional, minimal, playful")
-            
-            design_style = st.selectbox("Visual style reference:",
-                                      ["Japandi (minimal, neutral)", "Corporate and Professional", 
-                                       "Vibrant and Playful", "Dark and Elegant", "Custom"])
+                params["Vibe/Adjectives"] = st.text_input("Describe the vibe with adjectives:",
+                                                          placeholder="e.g., vibrant, professional, minimal, playful")
             
             if design_style == "Custom":
-                custom_style = st.text_input("Describe your custom style:")
+                params["Visual Style"] = st.text_input("Describe your custom style:")
+            else:
+                params["Visual Style"] = design_style
         
         with col2:
             st.subheader("Theme Options")
             
+            # Theme options only feed into detailed prompts
+            theme: Dict[str, str] = {}
+            
             # Color options
-            color_choice = st.radio("Color specification:", ["Mood-based", "Specific colors"])
             if color_choice == "Specific colors":
-                primary_color = st.text_input("Primary color:", placeholder="e.g., forest green, #2ECC71")
+                theme["Color"] = st.text_input("Primary color:", placeholder="e.g., forest green, #2ECC71")
             else:
-                color_mood = st.text_input("Color mood:", placeholder="e.g., warm and inviting")
+                theme["Color"] = st.text_input("Color mood:", placeholder="e.g., warm and inviting")
             
             # Font options
-            font_style = st.selectbox("Font style:",
-                                    ["Default", "Playful sans-serif", "Professional serif", 
-                                     "Modern sans-serif", "Elegant serif", "Custom"])
-            
             if font_style == "Custom":
-                custom_font = st.text_input("Describe font style:")
+                theme["Font Style"] = st.text_input("Describe font style:")
+            else:
+                theme["Font Style"] = font_style
             
             # Component styling
-            button_style = st.selectbox("Button style:",
-                                      ["Default", "Fully rounded corners", "Sharp corners", 
-                                       "Slightly rounded", "Pill-shaped"])
+            theme["Button Style"] = st.selectbox("Button style:",
+                                               ["Default", "Fully rounded corners", "Sharp corners", 
+                                                "Slightly rounded", "Pill-shaped"])
             
             if prompt_level == "detailed":
                 st.subheader("Specific Screens")
-                specific_screen = st.text_input("Focus on specific screen (optional):",
-                                              placeholder="e.g., Product detail page, Login screen")
-        
-        # Generate prompt button
-        if st.button("🚀 Generate Stitch Prompts", type="primary", use_container_width=True):
-            if project_type and (prompt_level == "high-level" or project_description):
-                with st.spinner("Generating optimized prompt..."):
-                    try:
-                        # Prepare context for prompt generation based on level
-                        if prompt_level == "high-level":
-                            context = f"""
-                            Prompt Level: High-Level (for brainstorming)
-                            App Type: {project_type}
-                            Vibe/Adjectives: {vibe_adjectives if 'vibe_adjectives' in locals() else ''}
-                            Visual Style: {design_style if design_style != 'Custom' else custom_style if 'custom_style' in locals() else ''}
-                            """
-                        else:
-                            context = f"""
-                            Prompt Level: Detailed (for specific results)
-                            Project Type: {project_type}
-                            Description: {project_description}
-                            Features: {key_features}
-                            Vibe/Adjectives: {vibe_adjectives if 'vibe_adjectives' in locals() else ''}
-                            Visual Style: {design_style if design_style != 'Custom' else custom_style if 'custom_style' in locals() else ''}
-                            Color: {primary_color if color_choice == 'Specific colors' and 'primary_color' in locals() else color_mood if 'color_mood' in locals() else ''}
-                            Font Style: {font_style if font_style != 'Custom' else custom_font if 'custom_font' in locals() else ''}
-                            Button Style: {button_style}
-                            Specific Screen: {specific_screen if 'specific_screen' in locals() else ''}
-                            """
-                        
-                        response = client.models.generate_content(
-                            model="gemini-2.0-flash-exp",
-                            contents=f"""Create 3 different effective Stitch prompts following the official Stitch prompt guidelines.
-                            Each prompt should follow Stitch best practices:
-                            - Use clear, specific language
-                            - Include adjectives to set the vibe
-                            - Be concise but descriptive
-                            - Follow the appropriate format for {prompt_level} prompts
-                            
-                            Context: {context}
-                            
-                            For high-level prompts: Keep them short and conceptual with vibe-setting adjectives.
-                            For detailed prompts: Include specific features, components, and styling details.
-                            
-                            Each prompt should be ready to use directly in Stitch.""",
-                            config={
-                                "response_mime_type": "application/json",
-                                "response_schema": list[UIPromptSuggestion],
-                            },
-                        )
+                theme["Specific Screen"] = st.text_input("Focus on specific screen (optional):",
+                                                       placeholder="e.g., Product detail page, Login screen")
+                params.update(theme)
+        
+        submit_col, regenerate_col = st.columns([3, 1])
+        with submit_col:
+            submitted = st.form_submit_button("🚀 Generate Stitch Prompts", type="primary", use_container_width=True)
+        with regenerate_col:
+            regenerate = st.form_submit_button("🔁 New Variations", use_container_width=True)
+    
+    project_type = params.get("App Type") or params.get("Project Type")
+    
+    # Generate prompts on form submission
+    if submitted or regenerate:
+        if project_type and (prompt_level == "high-level" or params.get("Description")):
+            with st.spinner("Generating optimized prompt..."):
+                try:
+                    # Prepare context for prompt generation from the filled-in inputs
+                    context = build_context(tuple(params.items()))
+                    
+                    response_text = generate_text(
+                        api_key,
+                        f"""Create 3 different effective Stitch prompts following the official Stitch prompt guidelines.
+                        Each prompt should follow Stitch best practices:
+                        - Use clear, specific language
+                        - Include adjectives to set the vibe
+                        - Be concise but descriptive
+                        - Follow the appropriate format for {prompt_level} prompts
                         
-                        suggestions = response.parsed
+                        Context: {context}
                         
-                        st.success("✅ Stitch prompts generated successfully!")
+                        For high-level prompts: Keep them short and conceptual with vibe-setting adjectives.
+                        For detailed prompts: Include specific features, components, and styling details.
                         
-                        for idx, suggestion in enumerate(suggestions):
-                            with st.expander(f"Prompt Option {idx + 1}: {suggestion.prompt_title}", expanded=idx==0):
-                                st.subheader("Generated Stitch Prompt:")
-                                st.info("Click inside the box below and press Ctrl+A to select all, then Ctrl+C to copy")
-                                st.code(suggestion.suggested_prompt, language="text")
-                                
-                                st.subheader("Key Elements Covered:")
-                                for element in suggestion.key_elements:
-                                    st.write(f"✓ {element}")
-                                
-                                # Three buttons in a clean row
-                                col1, col2, col3 = st.columns(3)
-                                with col1:
-                                    st.download_button(
-                                        label="📥 Download Prompt",
-                                        data=suggestion.suggested_prompt,
-                                        file_name=f"stitch_prompt_{idx + 1}.txt",
-                                        mime="text/plain",
-                                        key=f"download_{idx}",
-                                        use_container_width=True
-                                    )
-                                
-                                with col2:
-                                    if st.button(f"💾 Save Prompt", key=f"save_{idx}", use_container_width=True):
-                                        st.session_state.generated_prompts.append({
-                                            "title": suggestion.prompt_title,
-                                            "prompt": suggestion.suggested_prompt,
-                                            "project_type": project_type,
-                                            "level": prompt_level,
-                                            "timestamp": "Just now"
-                                        })
-                                        st.toast("Prompt saved!", icon="✅")
-                                
-                                with col3:
-                                    if st.button(f"🎯 Use for Refinement", key=f"refine_{idx}", use_container_width=True):
-                                        st.session_state.base_prompt = suggestion.suggested_prompt
-                                        st.toast("Prompt set for refinement!", icon="🎯")
+                        Each prompt should be ready to use directly in Stitch.""",
+                        "UIPromptSuggestion",
+                        fresh=regenerate,
+                    )
                     
-                    except Exception as e:
-                        st.error(f"Error generating prompts: {str(e)}")
+                    suggestions = parse_structured(response_text, UIPromptSuggestion)
+                    if suggestions:
+                        # Keep the results so the options and actions below survive reruns
+                        st.session_state.prompt_suggestions = {
+                            "suggestions": suggestions,
+                            "payloads": [suggestion.suggested_prompt.encode("utf-8") for suggestion in suggestions],
+                            "project_type": project_type,
+                            "level": prompt_level,
+                        }
+                        
+                        st.success("✅ Stitch prompts generated successfully!")
+                    else:
+                        st.session_state.pop('prompt_suggestions', None)
+                        st.warning("No prompts were generated. Try 🔁 New Variations.")
+                
+                except Exception as e:
+                    st.error(f"Error generating prompts: {str(e)}")
+        else:
+            if prompt_level == "high-level":
+                st.warning("Please fill in the app type field.")
             else:
-                if prompt_level == "high-level":
-                    st.warning("Please fill in the app type field.")
+                st.warning("Please fill in the project type and description fields.")
+    
+    if 'prompt_suggestions' in st.session_state:
+        generated = st.session_state.prompt_suggestions
+        suggestions = generated["suggestions"]
+        
+        # Show the selected option
+        choice = st.radio("Prompt option:", range(len(suggestions)),
+                          format_func=lambda i: f"Option {i + 1}: {suggestions[i].prompt_title}",
+                          horizontal=True)
+        suggestion = suggestions[choice]
+        
+        st.subheader("Generated Stitch Prompt:")
+        st.info("Click inside the box below and press Ctrl+A to select all, then Ctrl+C to copy")
+        st.code(suggestion.suggested_prompt, language="text")
+        
+        st.subheader("Key Elements Covered:")
+        st.markdown(bullet_list(suggestion.key_elements, "✓"))
+        
+        # Three buttons in a clean row
+        col1, col2, col3 = st.columns(3)
+        with col1:
+            st.download_button(
+                label="📥 Download Prompt",
+                data=generated["payloads"][choice],
+                file_name=f"stitch_prompt_{choice + 1}.txt",
+                mime="text/plain",
+                use_container_width=True
+            )
+        
+        with col2:
+            if st.button("💾 Save Prompt", use_container_width=True):
+                if save_prompt({
+                    "title": suggestion.prompt_title,
+                    "prompt": suggestion.suggested_prompt,
+                    "project_type": generated["project_type"],
+                    "level": generated["level"],
+                }):
+                    st.toast("Prompt saved!", icon="✅")
                 else:
-                    st.warning("Please fill in the project type and description fields.")
+                    st.toast("Prompt already saved", icon="ℹ️")
+        
+        with col3:
+            if st.button("🎯 Use for Refinement", use_container_width=True):
+                st.session_state.base_prompt = suggestion.suggested_prompt
+                st.toast("Prompt set for refinement!", icon="🎯")
+
+@st.fragment
+def render_refine_screen(api_key):
+    flush_toasts()
+    st.header("🎯 Refine Screen by Screen")
+    
+    st.markdown("Use this section to make specific, incremental changes to your app screens.")
     
-    with tab4:
-        st.header("🎯 Refine Screen by Screen")
+    col1, col2 = st.columns([2, 1])
+    
+    with col1:
+        st.subheader("Specify Your Change")
+        
+        # Change type stays outside the form since it decides which fields are shown
+        change_type = st.selectbox("Type of change:",
+                                 ["Add component", "Modify component", "Change styling", 
+                                  "Update images", "Adjust layout", "Change text/language"])
+    
+    with col2:
+        st.subheader("Quick Templates")
         
-        st.markdown("Use this section to make specific, incremental changes to your app screens.")
+        template_choice = st.selectbox("Use a template:", REFINEMENT_NAMES)
         
+        if template_choice != "None":
+            template = REFINEMENT_TEMPLATES[template_choice]
+            st.info(f"Template: {template}")
+    
+    # Refinement inputs, submitted together
+    with st.form("refine_form"):
         # Base prompt input
         if 'base_prompt' in st.session_state:
             base_prompt = st.text_area("Base app description:", 
@@ -399,210 +691,234 @@ if api_key:
                                      placeholder="Paste your initial app prompt here or select from saved prompts",
                                      height=100)
         
-        col1, col2 = st.columns([2, 1])
+        # Screen selection
+        screen_name = st.text_input("Which screen to modify?",
+                                  placeholder="e.g., homepage, login screen, product detail page")
         
-        with col1:
-            st.subheader("Specify Your Change")
-            
-            # Screen selection
-            screen_name = st.text_input("Which screen to modify?",
-                                      placeholder="e.g., homepage, login screen, product detail page")
-            
-            # Change type
-            change_type = st.selectbox("Type of change:",
-                                     ["Add component", "Modify component", "Change styling", 
-                                      "Update images", "Adjust layout", "Change text/language"])
-            
-            # Specific change description
-            if change_type == "Add component":
-                change_detail = st.text_area("What to add:",
-                                           placeholder="e.g., Add a search bar to the header",
-                                           height=80)
-            elif change_type == "Modify component":
-                change_detail = st.text_area("What to modify:",
-                                           placeholder="e.g., Make the primary CTA button larger and blue",
-                                           height=80)
-            elif change_type == "Change styling":
-                style_element = st.selectbox("Style element:",
-                                           ["Colors", "Fonts", "Borders/Corners", "Spacing", "Overall theme"])
-                change_detail = st.text_area("Style change:",
-                                           placeholder="e.g., Change primary color to forest green",
-                                           height=80)
-            elif change_type == "Update images":
-                image_target = st.radio("Image scope:", ["Specific image", "All images on screen", "Background images"])
-                change_detail = st.text_area("Image change:",
-                                           placeholder="e.g., Change background of all product images to light taupe",
-                                           height=80)
-            elif change_type == "Adjust layout":
-                change_detail = st.text_area("Layout adjustment:",
-                                           placeholder="e.g., Switch to a 3-column grid for product cards",
-                                           height=80)
-            else:  # Change text/language
-                change_detail = st.text_area("Text/language change:",
-                                           placeholder="e.g., Switch all button text to Spanish",
-                                           height=80)
+        # Specific change description
+        if change_type == "Add component":
+            change_detail = st.text_area("What to add:",
+                                       placeholder="e.g., Add a search bar to the header",
+                                       height=80)
+        elif change_type == "Modify component":
+            change_detail = st.text_area("What to modify:",
+                                       placeholder="e.g., Make the primary CTA button larger and blue",
+                                       height=80)
+        elif change_type == "Change styling":
+            style_element = st.selectbox("Style element:",
+                                       ["Colors", "Fonts", "Borders/Corners", "Spacing", "Overall theme"])
+            change_detail = st.text_area("Style change:",
+                                       placeholder="e.g., Change primary color to forest green",
+                                       height=80)
+        elif change_type == "Update images":
+            image_target = st.radio("Image scope:", ["Specific image", "All images on screen", "Background images"])
+            change_detail = st.text_area("Image change:",
+                                       placeholder="e.g., Change background of all product images to light taupe",
+                                       height=80)
+        elif change_type == "Adjust layout":
+            change_detail = st.text_area("Layout adjustment:",
+                                       placeholder="e.g., Switch to a 3-column grid for product cards",
+                                       height=80)
+        else:  # Change text/language
+            change_detail = st.text_area("Text/language change:",
+                                       placeholder="e.g., Switch all button text to Spanish",
+                                       height=80)
         
-        with col2:
-            st.subheader("Quick Templates")
-            
-            refinement_templates = {
-                "Add search": "On the {screen}, add a search bar to the header.",
-                "Enlarge CTA": "Change the primary call-to-action button on the {screen} to be larger and use the brand's primary color.",
-                "Round buttons": "Make all buttons have fully rounded corners.",
-                "Update theme": "Update theme to a {mood} color palette.",
-                "Change font": "Use a {style} font for all text.",
-                "Add spacing": "Increase spacing between all components for better readability.",
-                "Mobile optimize": "Optimize the {screen} layout for mobile devices."
-            }
-            
-            template_choice = st.selectbox("Use a template:", 
-                                         ["None"] + list(refinement_templates.keys()))
-            
-            if template_choice != "None":
-                template = refinement_templates[template_choice]
-                st.info(f"Template: {template}")
-        
-        # Generate refinement prompt
-        if st.button("🔧 Generate Refinement Prompt", type="primary", use_container_width=True):
-            if base_prompt and screen_name and change_detail:
-                with st.spinner("Generating refinement prompt..."):
-                    try:
-                        refinement_context = f"""
-                        Base App: {base_prompt}
-                        Screen to Modify: {screen_name}
-                        Change Type: {change_type}
-                        Specific Change: {change_detail}
-                        """
-                        
-                        response = client.models.generate_content(
-                            model="gemini-2.0-flash-exp",
-                            contents=f"""Create a specific, clear Stitch refinement prompt following best practices.
-                            The prompt should:
-                            - Be specific about what to change and how
-                            - Reference the specific screen/component
-                            - Use clear UI/UX terminology
-                            - Be concise but complete
-                            - Follow Stitch's guideline of one major change at a time
-                            
-                            Context: {refinement_context}
-                            
-                            Generate just the refinement prompt text, nothing else.""",
-                        )
-                        
-                        refinement_prompt = response.text.strip()
-                        
-                        st.success("✅ Refinement prompt generated!")
-                        st.subheader("Your Refinement Prompt:")
-                        st.info("Click inside the box below and press Ctrl+A to select all, then Ctrl+C to copy")
-                        st.code(refinement_prompt, language="text")
-                        
-                        # Three buttons in a clean row
-                        col1, col2, col3 = st.columns(3)
-                        with col1:
-                            st.download_button(
-                                label="📥 Download Refinement",
-                                data=refinement_prompt,
-                                file_name="stitch_refinement.txt",
-                                mime="text/plain",
-                                use_container_width=True
-                            )
+        submitted = st.form_submit_button("🔧 Generate Refinement Prompt", type="primary", use_container_width=True)
+    
+    # Generate refinement prompt on form submission
+    if submitted:
+        if base_prompt and screen_name and change_detail:
+            with st.spinner("Generating refinement prompt..."):
+                try:
+                    refinement_context = build_context((
+                        ("Base App", base_prompt),
+                        ("Screen to Modify", screen_name),
+                        ("Change Type", change_type),
+                        ("Specific Change", change_detail),
+                    ))
+                    
+                    response_text = generate_text(
+                        api_key,
+                        f"""Create a specific, clear Stitch refinement prompt following best practices.
+                        The prompt should:
+                        - Be specific about what to change and how
+                        - Reference the specific screen/component
+                        - Use clear UI/UX terminology
+                        - Be concise but complete
+                        - Follow Stitch's guideline of one major change at a time
                         
-                        with col2:
-                            if st.button("💾 Save to History", use_container_width=True):
-                                st.session_state.generated_prompts.append({
-                                    "title": f"Refinement: {change_type} on {screen_name}",
-                                    "prompt": refinement_prompt,
-                                    "project_type": "Screen Refinement",
-                                    "level": "refinement",
-                                    "timestamp": "Just now"
-                                })
-                                st.toast("Refinement saved!", icon="✅")
+                        Context: {refinement_context}
                         
-                        with col3:
-                            if st.button("🎯 Use for Next Refinement", use_container_width=True):
-                                st.session_state.base_prompt = refinement_prompt
-                                st.toast("Refinement loaded as base!", icon="🎯")
+                        Generate just the refinement prompt text, nothing else.""",
+                    )
                     
-                    except Exception as e:
-                        st.error(f"Error generating refinement: {str(e)}")
-            else:
-                st.warning("Please fill in all required fields: base app description, screen name, and change details.")
+                    # Keep the result so the actions below still work after their own rerun
+                    refinement_prompt = response_text.strip()
+                    st.session_state.refinement = {
+                        "prompt": refinement_prompt,
+                        "payload": refinement_prompt.encode("utf-8"),
+                        "title": f"Refinement: {change_type} on {screen_name}",
+                    }
+                    
+                    st.success("✅ Refinement prompt generated!")
+                
+                except Exception as e:
+                    st.error(f"Error generating refinement: {str(e)}")
+        else:
+            st.warning("Please fill in all required fields: base app description, screen name, and change details.")
     
-    with tab5:
-        st.header("📝 Saved Prompts")
+    if 'refinement' in st.session_state:
+        refinement = st.session_state.refinement
         
-        if st.session_state.generated_prompts:
-            # Filter options
-            filter_type = st.selectbox("Filter by type:", 
-                                     ["All", "High-Level", "Detailed", "Refinement"])
-            
-            filtered_prompts = st.session_state.generated_prompts
-            if filter_type == "High-Level":
-                filtered_prompts = [p for p in filtered_prompts if p.get('level') == 'high-level']
-            elif filter_type == "Detailed":
-                filtered_prompts = [p for p in filtered_prompts if p.get('level') == 'detailed']
-            elif filter_type == "Refinement":
-                filtered_prompts = [p for p in filtered_prompts if p.get('level') == 'refinement']
-            
-            for idx, saved_prompt in enumerate(filtered_prompts):
-                level_badge = saved_prompt.get('level', 'unknown')
-                with st.expander(f"{saved_prompt['title']} - {saved_prompt['project_type']} [{level_badge}]", expanded=False):
-                    st.text(f"Saved: {saved_prompt['timestamp']}")
-                    st.info("Tip: Click in the code box and press Ctrl+A to select all, then Ctrl+C to copy")
-                    st.code(saved_prompt['prompt'], language="text")
-                    
-                    # Three buttons in a clean row
-                    col1, col2, col3 = st.columns(3)
-                    with col1:
-                        st.download_button(
-                            label="📥 Download",
-                            data=saved_prompt['prompt'],
-                            file_name=f"stitch_prompt_{saved_prompt['title'].replace(':', '_').replace(' ', '_')}.txt",
-                            mime="text/plain",
-                            key=f"download_saved_{idx}",
-                            use_container_width=True
-                        )
-                    
-                    with col2:
-                        if st.button(f"🎯 Use for Refinement", key=f"use_saved_{idx}", use_container_width=True):
-                            st.session_state.base_prompt = saved_prompt['prompt']
-                            st.toast("Prompt loaded for refinement!", icon="🎯")
-                    
-                    with col3:
-                        if st.button(f"🗑️ Delete", key=f"delete_saved_{idx}", use_container_width=True):
-                            st.session_state.generated_prompts.pop(idx)
-                            st.rerun()
+        st.subheader("Your Refinement Prompt:")
+        st.info("Click inside the box below and press Ctrl+A to select all, then Ctrl+C to copy")
+        st.code(refinement["prompt"], language="text")
+        
+        # Three buttons in a clean row
+        col1, col2, col3 = st.columns(3)
+        with col1:
+            st.download_button(
+                label="📥 Download Refinement",
+                data=refinement["payload"],
+                file_name="stitch_refinement.txt",
+                mime="text/plain",
+                use_container_width=True
+            )
+        
+        with col2:
+            if st.button("💾 Save to History", use_container_width=True):
+                if save_prompt({
+                    "title": refinement["title"],
+                    "prompt": refinement["prompt"],
+                    "project_type": "Screen Refinement",
+                    "level": "refinement",
+                }):
+                    st.toast("Refinement saved!", icon="✅")
+                else:
+                    st.toast("Refinement already saved", icon="ℹ️")
+        
+        with col3:
+            st.button("🎯 Use for Next Refinement", use_container_width=True, on_click=use_refinement)
+
+@st.fragment
+def render_saved_prompts():
+    flush_toasts()
+    st.header("📝 Saved Prompts")
+    
+    prompts = st.session_state.prompts
+    if prompts["title"]:
+        # Filter options
+        filter_type = st.selectbox("Filter by type:", 
+                                 ["All", "High-Level", "Detailed", "Refinement"])
+        
+        # Uids of the prompts matching the filter
+        if filter_type == "All":
+            filtered_uids = list(prompts["level"])
         else:
-            st.info("No saved prompts yet. Generate and save prompts from the 'Generate Prompt' tab.")
+            level = filter_type.lower()
+            filtered_uids = [uid for uid, prompt_level in prompts["level"].items() if prompt_level == level]
+        
+        st.download_button(
+            label="📥 Download All (JSON)",
+            data=st.session_state.prompts_export,
+            file_name="stitch_prompts.json",
+            mime="application/json",
+        )
+        
+        # Saved prompt columns
+        titles, bodies, filenames = prompts["title"], prompts["prompt"], prompts["filename"]
+        project_types, levels, timestamps = prompts["project_type"], prompts["level"], prompts["timestamp"]
+        
+        # Paginate the cards
+        page_count = max(1, math.ceil(len(filtered_uids) / PROMPTS_PER_PAGE))
+        page = 1
+        if page_count > 1:
+            page = st.number_input("Page", min_value=1, max_value=page_count, value=1, step=1)
+        page_start = (page - 1) * PROMPTS_PER_PAGE
+        
+        st.info("Tip: Click in a code box and press Ctrl+A to select all, then Ctrl+C to copy")
+        
+        for uid in filtered_uids[page_start:page_start + PROMPTS_PER_PAGE]:
+            title = titles[uid]
+            prompt = bodies[uid]
+            with st.expander(f"{title} - {project_types[uid]} [{levels[uid]}]", expanded=False):
+                st.code(prompt, language="text")
+                
+                st.text(f"Saved: {timestamps[uid]}")
+                st.download_button(
+                    label="📥 Download",
+                    data=prompt,
+                    file_name=filenames[uid],
+                    mime="text/plain",
+                    key=f"download_saved_{uid}"
+                )
+                
+                # Use/Delete action, applied on submit
+                with st.form(key=f"card_{uid}", border=False):
+                    st.radio("Action:", CARD_ACTIONS, key=f"action_{uid}",
+                             horizontal=True, label_visibility="collapsed")
+                    st.form_submit_button("Apply", on_click=apply_card_action, args=(uid,))
+    else:
+        st.info("No saved prompts yet. Generate and save prompts from the 'Generate Prompt' tab.")
+
+
+# App header
+st.title("🎨 Stitch UI Prompt Generator")
+st.markdown("Generate effective prompts for building user interfaces with Stitch AI")
+
+# Sidebar for API configuration
+with st.sidebar:
+    st.header("Configuration")
+    api_key = st.text_input("Google Gemini API Key", type="password")
     
-else:
-    # Show instructions when no API key is provided
-    st.warning("Please enter your Google Gemini API Key in the sidebar to start using the app.")
+    if api_key:
+        st.success("API Key configured ✓")
+    else:
+        st.warning("Please enter your Google Gemini API Key")
     
-    st.markdown("""
-    ### How to get started:
+    # Cache diagnostics
+    if st.checkbox("Show cache stats"):
+        st.caption(f"Each cache holds up to {CACHE_MAX_ENTRIES} entries; "
+                   f"Gemini clients and responses expire after {CACHE_TTL // 60} minutes")
+        info = build_context.cache_info()
+        st.text(f"build_context: {info.currsize}/{info.maxsize} entries, "
+                f"{info.hits} hits, {info.misses} misses")
     
-    1. **Get a Google Gemini API Key**: Visit [Google AI Studio](https://makersuite.google.com/app/apikey) to create your API key
-    2. **Enter your API key** in the sidebar
-    3. **Learn Stitch best practices** in the Stitch Guide tab
-    4. **Generate optimized prompts** following Stitch guidelines
-    5. **Refine screen by screen** for perfect results
+    st.markdown("---")
+    st.markdown("### About")
+    st.markdown("This app helps you create effective prompts for Stitch AI following official guidelines.")
+    st.markdown("Based on the [Stitch Prompt Guide](https://stitch.ai)")
+
+# Main content area
+if api_key:
+    # Load this key's saved prompts when the session starts or the key changes
+    user_id = hash_api_key(api_key)
+    if st.session_state.get('prompts_user') != user_id:
+        set_saved_prompts(read_saved_prompts(user_id))
+        st.session_state.prompts_user = user_id
     
-    ### Features Based on Stitch Official Guide:
-    - 📚 Complete Stitch prompt guide with examples
-    - 🎯 High-level vs. Detailed prompt generation
-    - 🎨 Vibe-setting with adjectives
-    - 🔧 Screen-by-screen refinement tools
-    - 💾 Save and manage your Stitch prompts
+    # Section picker; only the selected section is rendered
+    active_section = st.radio("Section", SECTIONS, horizontal=True,
+                              label_visibility="collapsed", key="active_section")
+    
+    if active_section == SECTIONS[0]:
+        render_guide()
+    elif active_section == SECTIONS[1]:
+        render_sample_ideas(api_key)
+    elif active_section == SECTIONS[2]:
+        render_generate_prompt(api_key)
+    elif active_section == SECTIONS[3]:
+        render_refine_screen(api_key)
+    else:
+        render_saved_prompts()
+
+else:
+    # Show instructions when no API key is provided
+    st.warning("Please enter your Google Gemini API Key in the sidebar to start using the app.")
     
-    ### Stitch Best Practices:
-    - Be Clear & Concise
-    - One Major Change at a Time
-    - Use UI/UX Keywords
-    - Reference Elements Specifically
-    - Iterate & Experiment
-    """)
+    st.markdown(_GETTING_STARTED_MD)
 
 # Footer
 st.markdown("---")
-st.markdown("Built with Streamlit and Google Gemini API | Based on [Stitch Prompt Guide](https://stitch.ai) | [Documentation](https://docs.streamlit.io)")
+st.markdown(_FOOTER_MD)